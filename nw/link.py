@@ -1,14 +1,37 @@
 import heapq
-import random
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Protocol
+
+import numpy as np
 
 if TYPE_CHECKING:
     from nw.node import Node
     from nw.packet import Packet
-    from nw.network_event_scheduler import NetworkEventScheduler
+
+# ロス判定用に一度にまとめて引く乱数の個数
+LOSS_BLOCK_SIZE = 4096
+
+
+class SchedulerProtocol(Protocol):
+    """Linkが利用するスケジューラの構造的インターフェース
+
+    具象クラスを文字列アノテーションで参照する代わりに、
+    実際に使う属性とメソッドだけをProtocolとして宣言する。
+    AOTコンパイラがcurrent_timeを汎用の属性探索ではなく
+    直接のフィールド参照として扱えるようにするのが狙い。
+    NetworkEventSchedulerはこの型を構造的に満たす。
+    """
+
+    current_time: float
+
+    def schedule_event(self, event_time: float, callback, *args) -> None: ...
+
+    def add_link(
+        self, node1_id: int, node2_id: int, label: str, bandwidth: int, delay: float
+    ) -> None: ...
+
 
 class Link:
-    def __init__(self, node_x: "Node", node_y: "Node", network_event_scheduler: "NetworkEventScheduler", bandwidth: int = 10000, delay: float = 0.001, loss_rate: float = 0.0) -> None:
+    def __init__(self, node_x: "Node", node_y: "Node", network_event_scheduler: SchedulerProtocol, bandwidth: int = 10000, delay: float = 0.001, loss_rate: float = 0.0) -> None:
         """ネットワーク内のリンクを表すLinkクラス
 
         Args:
@@ -23,12 +46,33 @@ class Link:
         self.node_x = node_x
         self.node_y = node_y
         self.bandwidth = bandwidth
+        # 転送時間の計算で除算を乗算に置き換えるための逆数
+        self.bandwidth_recip = 1.0 / bandwidth
         self.delay = delay
         self.loss_rate = loss_rate
         self.packet_queue_xy = []
         self.packet_queue_yx = []
-        self.current_queue_time_xy = 0
-        self.current_queue_time_yx = 0
+        # from_nodeのidをキーに各方向の状態を引くための辞書
+        # （メソッドごとのnode_x比較分岐をなくし、1回の辞書参照に置き換える）
+        self._queues = {
+            id(node_x): self.packet_queue_xy,
+            id(node_y): self.packet_queue_yx,
+        }
+        # 各方向の送出が埋まっている時刻（busy-until）
+        # キュー時間の加算・減算で管理する代わりに、この1つのタイムスタンプで
+        # 「次のパケットをいつから送出できるか」を表す
+        # （リストに包んで参照経由で更新できるようにする）
+        self._busy_until = {id(node_x): [0.0], id(node_y): [0.0]}
+        self._next_nodes = {id(node_x): node_y, id(node_y): node_x}
+        # ロス判定の乱数はパケットごとに引かず、ブロック単位で先に引いておく
+        self._loss_block = None
+        self._loss_index = 0
+        # キュー内のエントリを一意に順序付ける連番
+        # （heapqが同時刻のエントリでPacket同士を比較しないようにする）
+        self._queue_seq = 0
+        # バインド済みメソッドを一度だけ作っておき、イベント登録のたびに
+        # MethodTypeオブジェクトが生成されるのを防ぐ
+        self._cb_transfer = self.transfer_packet
 
 
         # ノードに対してリンクを接続
@@ -45,19 +89,23 @@ class Link:
             packet (Packet): 追加するパケット
             from_node (Node): パケットを送信したノード
         """
-        if from_node == self.node_x:
-            queue = self.packet_queue_xy
-            current_queue_time = self.current_queue_time_xy
-        else:
-            queue = self.packet_queue_yx
-            current_queue_time = self.current_queue_time_yx
-
-        packet_transfer_time = (packet.size * 8) / self.bandwidth
-        dequeue_time = self.network_event_scheduler.current_time + current_queue_time
-        heapq.heappush(queue, (dequeue_time, packet, from_node))
-        self.add_to_queue_time(from_node, packet_transfer_time)
+        from_id = id(from_node)
+        queue = self._queues[from_id]
+        busy_until = self._busy_until[from_id]
+
+        # スケジューラへの属性チェーン参照はローカル変数に束ねる
+        scheduler = self.network_event_scheduler
+        # 転送時間はbusy-untilの更新にしか使わないので、ここで計算して
+        # ローカル変数で使い切る（キューのエントリには持たせない）
+        packet_transfer_time = (packet.size * 8) * self.bandwidth_recip
+        # 前のパケットの送出完了を待ってから送出を開始する
+        now = scheduler.current_time
+        dequeue_time = busy_until[0] if busy_until[0] > now else now
+        busy_until[0] = dequeue_time + packet_transfer_time
+        heapq.heappush(queue, (dequeue_time, self._queue_seq, packet))
+        self._queue_seq += 1
         if len(queue) == 1:
-            self.network_event_scheduler.schedule_event(dequeue_time, self.transfer_packet, from_node)
+            scheduler.schedule_event(dequeue_time, self._cb_transfer, from_node)
 
     def transfer_packet(self, from_node: "Node") -> None:
         """リンクからパケットを転送する
@@ -65,50 +113,45 @@ class Link:
         Args:
             from_node (Node): パケットを送信したノード
         """
-        if from_node == self.node_x:
-            queue = self.packet_queue_xy
-        else:
-            queue = self.packet_queue_yx
+        from_id = id(from_node)
+        queue = self._queues[from_id]
 
         if queue:
-            dequeue_time, packet, _ = heapq.heappop(queue)
-            packet_transfer_time = (packet.size * 8) / self.bandwidth
-
-            if random.random() < self.loss_rate:
-                packet.set_arrived(-1)
-
-            next_node = self.node_x if from_node != self.node_x else self.node_y
-            self.network_event_scheduler.schedule_event(self.network_event_scheduler.current_time + self.delay, next_node.receive_packet, packet)
-            self.network_event_scheduler.schedule_event(dequeue_time + packet_transfer_time, self.subtract_from_queue_time, from_node, packet_transfer_time)
+            # busy-untilはエンキュー時に更新済みのタイムスタンプなので、
+            # ここでは転送時間の再計算も後処理も不要
+            dequeue_time, _, packet = heapq.heappop(queue)
+
+            # loss_rateが0のリンクでは乱数を一切引かない
+            if self.loss_rate > 0.0:
+                if self._loss_block is None or self._loss_index == LOSS_BLOCK_SIZE:
+                    self._refill_loss_block()
+                if self._loss_block[self._loss_index]:
+                    packet.set_arrived(-1)
+                self._loss_index += 1
+
+            next_node = self._next_nodes[from_id]
+            scheduler = self.network_event_scheduler
+            if self.delay == 0.0:
+                # 遅延のないリンクは配送イベントを積まずにその場で届ける
+                next_node.receive_packet(packet)
+            else:
+                scheduler.schedule_event(
+                    scheduler.current_time + self.delay,
+                    next_node._cb_receive,
+                    packet,
+                )
 
             if queue:
                 next_packet_time = queue[0][0]
-                self.network_event_scheduler.schedule_event(next_packet_time, self.transfer_packet, from_node)
+                scheduler.schedule_event(next_packet_time, self._cb_transfer, from_node)
 
-    def add_to_queue_time(self, from_node: "Node", packet_transfer_time: float) -> None:
-        """リンクのキュー時間を更新する
+    def _refill_loss_block(self) -> None:
+        """ロス判定用の乱数ブロックをまとめて引き直す"""
+        # NumPyでLOSS_BLOCK_SIZE個の判定結果を一括生成する
+        self._loss_block = np.random.random(LOSS_BLOCK_SIZE) < self.loss_rate
+        self._loss_index = 0
 
-        Args:
-            from_node (Node): パケットを送信したノード
-            packet_transfer_time (float): パケットの転送時間
-        """
-        if from_node == self.node_x:
-            self.current_queue_time_xy += packet_transfer_time
-        else:
-            self.current_queue_time_yx += packet_transfer_time
 
-    def subtract_from_queue_time(self, from_node: "Node", packet_transfer_time: float) -> None:
-        """リンクのキュー時間を減算する
-
-        Args:
-            from_node (Node): パケットを送信したノード
-            packet_transfer_time (float): パケットの転送時間
-        """
-        if from_node == self.node_x:
-            self.current_queue_time_xy -= packet_transfer_time
-        else:
-            self.current_queue_time_yx -= packet_transfer_time
-    
     def __str__(self) -> str:
         """リンクの文字列表現を返す"""
         return f"Link(node_x={self.node_x.node_id}, node_y={self.node_y.node_id}, bandwidth={self.bandwidth}, delay={self.delay}, packet_loss={self.packet_loss})"
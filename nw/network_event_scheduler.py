@@ -1,40 +1,167 @@
 from collections import defaultdict
-import heapq
+import math
+import sys
+
 import matplotlib.pyplot as plt
-import networkx as nx
 import numpy as np
 
-from typing import TYPE_CHECKING
-
-if TYPE_CHECKING:
-    from nw.packet import Packet
+from nw.packet import Packet
+
+# Numbaが利用できる場合は集計カーネルをJITコンパイルする（任意依存）
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# ログで使うイベント種別の文字列定数
+# internしておくことで、辞書参照や等価比較がポインタ比較で決着する
+EVT_CREATED = sys.intern("created")
+EVT_SENT = sys.intern("sent")
+EVT_RECEIVED = sys.intern("received")
+EVT_ARRIVED = sys.intern("arrived")
+EVT_LOST = sys.intern("lost")
+
+# イベント種別と列バッファに格納する番号の対応
+EVENT_TYPE_CODES = {
+    EVT_CREATED: 0,
+    EVT_SENT: 1,
+    EVT_RECEIVED: 2,
+    EVT_ARRIVED: 3,
+    EVT_LOST: 4,
+}
+# 番号からイベント種別名への逆引き
+EVENT_TYPE_NAMES = [EVT_CREATED, EVT_SENT, EVT_RECEIVED, EVT_ARRIVED, EVT_LOST]
+# イベント列バッファの初期容量
+LOG_INITIAL_CAPACITY = 1 << 16
+
+
+# 以下はheapqの代わりに使う4分ヒープの実装
+# 分岐が4方向になることで木の高さが半分になり、同じ要素数でも
+# 比較・スワップ回数とキャッシュミスが減る
+
+
+if njit is not None:
+
+    @njit(cache=True)
+    def _accumulate_slot_bits(slot_indices, sizes, num_slots):
+        """スロットごとの受信ビット数を集計する（Numba版）"""
+        totals = np.zeros(num_slots, dtype=np.float64)
+        for i in range(slot_indices.size):
+            totals[slot_indices[i]] += sizes[i] * 8.0
+        return totals
+
+else:
+
+    def _accumulate_slot_bits(slot_indices, sizes, num_slots):
+        """スロットごとの受信ビット数を集計する（NumPy版フォールバック）"""
+        return np.bincount(slot_indices, weights=sizes * 8.0, minlength=num_slots)
+
+
+def _siftdown4(heap: list, i: int) -> None:
+    """指定位置の要素を4分ヒープの適切な位置まで沈める"""
+    n = len(heap)
+    item = heap[i]
+    while True:
+        child = (i << 2) + 1
+        if child >= n:
+            break
+        end = min(child + 4, n)
+        # 最大4つの子から最小の子を選ぶ
+        min_child = child
+        for c in range(child + 1, end):
+            if heap[c] < heap[min_child]:
+                min_child = c
+        if item <= heap[min_child]:
+            break
+        heap[i] = heap[min_child]
+        i = min_child
+    heap[i] = item
+
+
+def _heappush4(heap: list, item) -> None:
+    """4分ヒープに要素を追加する"""
+    heap.append(item)
+    i = len(heap) - 1
+    while i > 0:
+        parent = (i - 1) >> 2
+        if heap[parent] <= item:
+            break
+        heap[i] = heap[parent]
+        i = parent
+    heap[i] = item
+
+
+def _heappop4(heap: list):
+    """4分ヒープから最小要素を取り出す"""
+    last = heap.pop()
+    if not heap:
+        return last
+    item = heap[0]
+    heap[0] = last
+    _siftdown4(heap, 0)
+    return item
+
+
+def _heapify4(heap: list) -> None:
+    """リストをその場で4分ヒープに変換する"""
+    for i in range((len(heap) - 2) >> 2, -1, -1):
+        _siftdown4(heap, i)
 
 
 class NetworkEventScheduler:
     """ネットワークシミュレーション用のイベントスケジューラクラス"""
 
-    def __init__(self, log_enabled: bool = False, verbose: bool = False):
+    def __init__(
+        self, log_enabled: bool = False, verbose: bool = False, bucket_width: float = 1.0
+    ):
         """
         ネットワークイベントスケジューラの初期化
 
         Args:
             log_enabled (bool): ロギングを有効にするかどうか
             verbose (bool): 詳細出力を有効にするかどうか
+            bucket_width (float): イベントバケット1つが受け持つ時間幅（秒）
         """
         # 現在のシミュレーション時間を管理
-        self.current_time = 0
-        # イベントキュー（優先度付きキュー）
-        self.events = []
+        # （@propertyにはせず、常にfloatの素の属性として持つ。
+        # ホットパスの参照がディスクリプタ呼び出しを経由しないようにする）
+        self.current_time = 0.0
+        # イベントを時間スライスごとに分けたバケット（スライス番号 -> ヒープ）
+        # 1つの巨大なヒープではなく小さなヒープ群に分けることで、
+        # イベント数Nに対するO(log N)の操作をO(log k)（kはバケット内の数）に抑える
+        self.buckets: dict[int, list] = {}
+        # 空でないバケットのスライス番号を昇順に取り出すための優先度付きキュー
+        self.bucket_indices: list[int] = []
+        # バケット1つが受け持つ時間幅（リンク遅延の数倍程度が目安）
+        self.bucket_width = bucket_width
         # イベントの一意性を保証するためのID
         self.event_id = 0
-        # パケットの送受信ログを保存
+        # パケットごとのメタ情報（送信元・宛先・サイズ・作成/到着時刻）
         self.packet_logs = {}
+        # パケットIDを列バッファ用の連番に変換する辞書
+        self._packet_indices = {}
+        # イベントはdictのリストではなく列指向（SoA）のNumPy配列に記録する
+        # （イベント1件あたりのメモリをdict+6キーから数十バイトに抑える）
+        self._log_size = 0
+        if log_enabled:
+            self.log_time = np.empty(LOG_INITIAL_CAPACITY, dtype=np.float64)
+            self.log_packet_index = np.empty(LOG_INITIAL_CAPACITY, dtype=np.int64)
+            self.log_node_id = np.empty(LOG_INITIAL_CAPACITY, dtype=np.int64)
+            self.log_event_type = np.empty(LOG_INITIAL_CAPACITY, dtype=np.uint8)
+        else:
+            self.log_time = None
+            self.log_packet_index = None
+            self.log_node_id = None
+            self.log_event_type = None
         # ログ機能の有効/無効フラグ
         self.log_enabled = log_enabled
         # 詳細出力の有効/無効フラグ
         self.verbose = verbose
-        # ネットワークトポロジーを表現するグラフ
-        self.graph = nx.Graph()
+        # ネットワークトポロジー（ノードIDとラベル、エッジと属性）
+        # シミュレーション中はnx.Graphを使わず軽量なdict/listで保持し、
+        # 描画が必要になったときだけNetworkXのグラフに変換する
+        self._nodes: dict[int, str] = {}
+        self._edges: list[tuple[int, int, dict]] = []
 
     def add_node(self, node_id: int, label: str) -> None:
         """ネットワークにノードを追加する
@@ -43,7 +170,7 @@ class NetworkEventScheduler:
             node_id (int): ノードの一意な識別子
             label (str): ノードのラベル
         """
-        self.graph.add_node(node_id, label=label)
+        self._nodes[node_id] = label
 
     def add_link(
         self, node1_id: int, node2_id: int, label: str, bandwidth: int, delay: float
@@ -57,14 +184,17 @@ class NetworkEventScheduler:
             bandwidth (int): リンクの帯域幅
             delay (float): リンクの遅延
         """
-        # グラフにエッジ（リンク）を追加し、帯域幅・遅延・ラベル属性を設定
-        self.graph.add_edge(
-            node1_id, node2_id, label=label, bandwidth=bandwidth, delay=delay
+        # エッジ（リンク）と帯域幅・遅延・ラベル属性を記録する
+        self._edges.append(
+            (node1_id, node2_id, {"label": label, "bandwidth": bandwidth, "delay": delay})
         )
 
     def draw(self) -> None:
         """ネットワークトポロジーをグラフィカルに描画する"""
-        
+        # NetworkXは描画時にしか使わないため、ここで初めてインポートする
+        import networkx as nx
+
+
         def get_edge_widths(bandwidths: int):
             """帯域幅に基づいてエッジの幅を計算する
 
@@ -88,21 +218,27 @@ class NetworkEventScheduler:
             else:
                 return "red"      # 高遅延（問題）
 
+        # 保持しているdict/listからNetworkXのグラフをその場で構築する
+        graph = nx.Graph()
+        for node_id, label in self._nodes.items():
+            graph.add_node(node_id, label=label)
+        for node1_id, node2_id, attrs in self._edges:
+            graph.add_edge(node1_id, node2_id, **attrs)
+
         # ノードの位置をspring layoutアルゴリズムで自動配置
-        pos = nx.spring_layout(self.graph)
+        pos = nx.spring_layout(graph)
         # 各エッジの帯域幅に基づいて線幅を計算
         edge_widths = [
-            get_edge_widths(self.graph[u][v]["bandwidth"])
-            for u, v in self.graph.edges()
+            get_edge_widths(graph[u][v]["bandwidth"]) for u, v in graph.edges()
         ]
         # 各エッジの遅延に基づいて色を計算
         edge_colors = [
-            get_edge_color(self.graph[u][v]["delay"]) for u, v in self.graph.edges()
+            get_edge_color(graph[u][v]["delay"]) for u, v in graph.edges()
         ]
 
         # ネットワークグラフを描画
         nx.draw(
-            self.graph,
+            graph,
             pos,
             with_labels=False,     # ノードラベルは別途描画
             node_color="lightblue", # ノードの色
@@ -112,11 +248,11 @@ class NetworkEventScheduler:
         )
         # ノードラベルを描画
         nx.draw_networkx_labels(
-            self.graph, pos, labels=nx.get_node_attributes(self.graph, "label")
+            graph, pos, labels=nx.get_node_attributes(graph, "label")
         )
         # エッジラベルを描画
         nx.draw_networkx_edge_labels(
-            self.graph, pos, edge_labels=nx.get_edge_attributes(self.graph, "label")
+            graph, pos, edge_labels=nx.get_edge_attributes(graph, "label")
         )
         # グラフを表示
         plt.show()
@@ -130,59 +266,142 @@ class NetworkEventScheduler:
             *args: コールバック関数に渡す引数
         """
         # イベントをタプルとして作成（時間、ID、コールバック、引数）
+        # event_idは単調増加するintで一意なため、時間が同じイベント同士の
+        # 比較はIDで必ず決着し、heapqがcallbackやargsを比較することはない
         event = (event_time, self.event_id, callback, args)
-        # 優先度付きキューにイベントを追加（時間順にソート）
-        heapq.heappush(self.events, event)
+        # イベント時間が属するバケットを求め、そのバケットのヒープに追加する
+        bucket_index = int(event_time / self.bucket_width)
+        bucket = self.buckets.get(bucket_index)
+        if bucket is None:
+            # 新しいバケットを作成し、スライス番号を管理キューに登録
+            bucket = self.buckets[bucket_index] = []
+            _heappush4(self.bucket_indices, bucket_index)
+        _heappush4(bucket, event)
         # 次のイベント用にIDをインクリメント
         self.event_id += 1
 
-    def log_packet_info(self, packet: "Packet", event_type: str, node_id=None) -> None:
+    def schedule_batch(self, event_times, callback, *args) -> None:
+        """同じコールバックのイベントをまとめてスケジュールする
+
+        バケットごとにまとめて追加し、最後にheapifyを1回ずつ呼ぶことで、
+        1件ずつheappushするよりも安い償却コストで登録できる
+
+        Args:
+            event_times: イベントの発生時間のシーケンス
+            callback: イベントが発生したときに呼び出される関数
+            *args: コールバック関数に渡す引数
+        """
+        width = self.bucket_width
+        buckets = self.buckets
+        event_id = self.event_id
+        # heapifyが必要になったバケットを記録する
+        touched = set()
+        for event_time in event_times:
+            bucket_index = int(event_time / width)
+            bucket = buckets.get(bucket_index)
+            if bucket is None:
+                # 新しいバケットを作成し、スライス番号を管理キューに登録
+                bucket = buckets[bucket_index] = []
+                _heappush4(self.bucket_indices, bucket_index)
+            # ヒープ不変条件は崩して追加し、後でまとめて回復する
+            bucket.append((event_time, event_id, callback, args))
+            event_id += 1
+            touched.add(bucket_index)
+        self.event_id = event_id
+        for bucket_index in touched:
+            _heapify4(buckets[bucket_index])
+
+    def acquire_packet(
+        self, source: str, destination: str, header_size: int, payload_size: int
+    ) -> Packet:
+        """プールからパケットを取得する（プールが空なら新規作成する）
+
+        プールの実体はPacketクラスのフリーリスト（Packet.acquire/release）
+
+        Args:
+            source (str): パケットの送信元アドレス
+            destination (str): パケットの宛先アドレス
+            header_size (int): パケットのヘッダーサイズ
+            payload_size (int): パケットのペイロードサイズ
+        """
+        return Packet.acquire(
+            source, destination, header_size, payload_size, self.current_time
+        )
+
+    def release_packet(self, packet: Packet) -> None:
+        """使い終わったパケットをプールに戻す
+
+        Args:
+            packet (Packet): 返却するパケット
+        """
+        Packet.release(packet)
+
+    def log_packet_info(self, packet: Packet, event_type: str, node_id=None) -> None:
         """パケットの状態変化をログに記録する"""
         # ログ機能が有効な場合のみ処理
-        if self.log_enabled:
-            # パケットIDが初回の場合、ログエントリを初期化
-            if packet.id not in self.packet_logs:
-                self.packet_logs[packet.id] = {
-                    "source": packet.header["source"],
-                    "destination": packet.header["destination"],
-                    "size": packet.size,
-                    "creation_time": packet.creation_time,
-                    "arrival_time": packet.arrival_time,
-                    "events": [],
-                }
-
-            # パケット到着時は到着時刻を更新
-            if event_type == "arrival":
-                self.packet_logs[packet.id]["arrival_time"] = self.current_time
-
-            # イベント情報を作成
-            event_info = {
-                "time": self.current_time,
-                "event": event_type,
-                "node_id": node_id,
-                "packet_id": packet.id,
-                "src": packet.header["source"],
-                "dst": packet.header["destination"],
+        if not self.log_enabled:
+            return
+
+        # パケットIDが初回の場合、連番を採番してメタ情報を初期化
+        packet_index = self._packet_indices.get(packet.id)
+        if packet_index is None:
+            packet_index = len(self._packet_indices)
+            self._packet_indices[packet.id] = packet_index
+            self.packet_logs[packet.id] = {
+                "source": packet.source,
+                "destination": packet.destination,
+                "size": packet.size,
+                "creation_time": packet.creation_time,
+                "arrival_time": packet.arrival_time,
             }
-            # イベントリストに追加
-            self.packet_logs[packet.id]["events"].append(event_info)
 
-            # 詳細出力が有効な場合、リアルタイムで情報を表示
-            if self.verbose:
-                print(
-                    f"Time: {self.current_time} Node: {node_id}, Event: {event_type}, Packet: {packet.id}, Src: {packet.header['source']}, Dst: {packet.header['destination']}"
-                )
+        # パケット到着時は到着時刻を更新
+        if event_type == EVT_ARRIVED:
+            self.packet_logs[packet.id]["arrival_time"] = self.current_time
+
+        # イベントを列バッファに追記する（dictは作らない）
+        i = self._log_size
+        if i == self.log_time.size:
+            self._grow_log_buffers()
+        self.log_time[i] = self.current_time
+        self.log_packet_index[i] = packet_index
+        self.log_node_id[i] = -1 if node_id is None else node_id
+        self.log_event_type[i] = EVENT_TYPE_CODES[event_type]
+        self._log_size = i + 1
+
+        # 詳細出力が有効な場合、リアルタイムで情報を表示
+        if self.verbose:
+            print(
+                f"Time: {self.current_time} Node: {node_id}, Event: {event_type}, Packet: {packet.id}, Src: {packet.source}, Dst: {packet.destination}"
+            )
+
+    def _grow_log_buffers(self) -> None:
+        """イベント列バッファの容量を2倍に拡張する"""
+        new_capacity = self.log_time.size * 2
+        self.log_time = np.resize(self.log_time, new_capacity)
+        self.log_packet_index = np.resize(self.log_packet_index, new_capacity)
+        self.log_node_id = np.resize(self.log_node_id, new_capacity)
+        self.log_event_type = np.resize(self.log_event_type, new_capacity)
 
     def print_packet_logs(self):
         """パケットのログを出力する"""
+        # ログ無効時は列バッファを確保していないので何も表示しない
+        if self.log_time is None:
+            return
+        # 記録済みの範囲だけを列バッファから切り出す
+        n = self._log_size
+        times = self.log_time[:n]
+        packet_indices = self.log_packet_index[:n]
+        event_types = self.log_event_type[:n]
         # 各パケットのログを順次表示
         for packet_id, log in self.packet_logs.items():
             print(
                 f"Packet ID: {packet_id} Src: {log['source']} {log['creation_time']} -> Dst: {log['destination']} {log['arrival_time']}"
             )
-            # パケットの各イベントを表示
-            for event in log["events"]:
-                print(f"Time: {event['time']}, Event: {event['event']}")
+            # このパケットのイベント行を列バッファから抽出して表示
+            packet_index = self._packet_indices[packet_id]
+            for j in np.nonzero(packet_indices == packet_index)[0]:
+                print(f"Time: {times[j]}, Event: {EVENT_TYPE_NAMES[event_types[j]]}")
 
     def generate_summary(self, packet_logs: dict):
         """パケットのログからトラフィックの概要を生成する
@@ -215,7 +434,7 @@ class NetworkEventScheduler:
             )
 
             # パケットが正常に到着した場合
-            if "arrival_time" in log and log["arrival_time"] is not None:
+            if not math.isnan(log["arrival_time"]):
                 # 受信統計を更新
                 summary_data[src_dst_pair]["received_packets"] += 1
                 summary_data[src_dst_pair]["received_bytes"] += log["size"]
@@ -272,36 +491,36 @@ class NetworkEventScheduler:
         max_time = max(
             log["arrival_time"]
             for log in packet_logs.values()
-            if log["arrival_time"] is not None
+            if not math.isnan(log["arrival_time"])
         )
         min_time = min(log["creation_time"] for log in packet_logs.values())
         # スロットの総数を計算
         num_slots = int((max_time - min_time) / time_slot) + 1
 
-        # 送信元-送信先ペアごとのスループットデータを収集
-        throughput_data = defaultdict(list)
+        # 送信元-送信先ペアごとに到着スロットとパケットサイズを収集
+        throughput_data = defaultdict(lambda: ([], []))
         for packet_id, log in packet_logs.items():
-            if log["arrival_time"] is not None:
+            if not math.isnan(log["arrival_time"]):
                 src_dst_pair = (log["source"], log["destination"])
                 # パケット到着時間からスロットインデックスを計算
                 slot_index = int((log["arrival_time"] - min_time) / time_slot)
-                throughput_data[src_dst_pair].append((slot_index, log["size"]))
-
-        # 各スロットのスループットを集計
-        aggregated_throughput = defaultdict(lambda: defaultdict(int))
-        for src_dst, packets in throughput_data.items():
-            for slot_index in range(num_slots):
-                # 該当スロットのパケットサイズを合計してbpsに変換
-                slot_throughput = sum(
-                    size * 8 for i, size in packets if i == slot_index
-                )
-                aggregated_throughput[src_dst][slot_index] = slot_throughput / time_slot
+                slot_indices, sizes = throughput_data[src_dst_pair]
+                slot_indices.append(slot_index)
+                sizes.append(log["size"])
 
         # グラフを描画
-        for src_dst, slot_data in aggregated_throughput.items():
-            time_slots = list(range(num_slots))
-            throughputs = [slot_data[slot] for slot in time_slots]
-            times = [min_time + slot * time_slot for slot in time_slots]
+        for src_dst, (slot_indices, sizes) in throughput_data.items():
+            # スロットごとのビット数を集計カーネルで一括計算してbpsに変換
+            # （Numbaがあればネイティブコード、なければNumPyの1パス処理）
+            throughputs = (
+                _accumulate_slot_bits(
+                    np.asarray(slot_indices, dtype=np.int64),
+                    np.asarray(sizes, dtype=np.float64),
+                    num_slots,
+                )
+                / time_slot
+            )
+            times = min_time + np.arange(num_slots) * time_slot
             # ステップグラフとして描画
             plt.step(
                 times,
@@ -329,7 +548,7 @@ class NetworkEventScheduler:
         # 送信元-送信先ペアごとの遅延データを収集
         delay_data = defaultdict(list)
         for packet_id, log in packet_logs.items():
-            if log["arrival_time"] is not None:
+            if not math.isnan(log["arrival_time"]):
                 src_dst_pair = (log["source"], log["destination"])
                 # パケットの遅延時間を計算
                 delay = log["arrival_time"] - log["creation_time"]
@@ -346,9 +565,9 @@ class NetworkEventScheduler:
         # 各送信元-送信先ペアごとにヒストグラムを作成
         for i, (src_dst, delays) in enumerate(delay_data.items()):
             ax = axs[i] if num_plots > 1 else axs
-            # ヒストグラムを描画
+            # ヒストグラムを描画（ndarrayを渡してmatplotlibの高速パスを使う）
             ax.hist(
-                delays,
+                np.asarray(delays, dtype=np.float64),
                 bins=np.arange(0, max_delay + bin_width, bin_width),
                 alpha=0.5,
                 color="royalblue",
@@ -365,14 +584,25 @@ class NetworkEventScheduler:
 
     def run(self):
         """イベントスケジューラを実行する"""
-        # イベントキューが空になるまで処理を続行
-        while self.events:
-            # 最も早い時間のイベントを取得
-            event_time, _, callback, args = heapq.heappop(self.events)
-            # 現在時刻を更新
-            self.current_time = event_time
-            # コールバック関数を実行
-            callback(*args)
+        # ループ内での属性参照を避けるためローカル変数に束縛
+        _pop = _heappop4
+        buckets = self.buckets
+        bucket_indices = self.bucket_indices
+        # バケットがなくなるまで、最も早い時間スライスから順に処理する
+        while bucket_indices:
+            bucket_index = bucket_indices[0]
+            bucket = buckets[bucket_index]
+            # バケット内のイベントを時刻順にすべて処理する
+            # （処理中に同じバケットへ追加されたイベントも拾う）
+            while bucket:
+                event_time, _, callback, args = _pop(bucket)
+                # 現在時刻を更新
+                self.current_time = event_time
+                # コールバック関数を実行
+                callback(*args)
+            # 空になったバケットを破棄して次のバケットへ進む
+            del buckets[bucket_index]
+            _pop(bucket_indices)
 
     def run_until(self, end_time):
         """指定された時間までイベントを実行する
@@ -380,9 +610,21 @@ class NetworkEventScheduler:
         Args:
             end_time (float): 実行を終了する時間
         """
-        # 指定時間以前のイベントのみ実行
-        while self.events and self.events[0][0] <= end_time:
-            # 次のイベントを取得して実行
-            event_time, callback, args = heapq.heappop(self.events)
-            self.current_time = event_time
-            callback(*args)
+        # ループ内での属性参照を避けるためローカル変数に束縛
+        _pop = _heappop4
+        buckets = self.buckets
+        bucket_indices = self.bucket_indices
+        # 最も早い時間スライスから順に、指定時間以前のイベントのみ実行
+        while bucket_indices:
+            bucket_index = bucket_indices[0]
+            bucket = buckets[bucket_index]
+            while bucket and bucket[0][0] <= end_time:
+                event_time, _, callback, args = _pop(bucket)
+                self.current_time = event_time
+                callback(*args)
+            if bucket:
+                # 指定時間を超えるイベントが残っているため処理を打ち切る
+                return
+            # 空になったバケットを破棄して次のバケットへ進む
+            del buckets[bucket_index]
+            _pop(bucket_indices)
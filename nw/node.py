@@ -1,10 +1,24 @@
 from typing import TYPE_CHECKING
-from nw.packet import Packet
+
+import numpy as np
+
+from nw.network_event_scheduler import (
+    EVT_ARRIVED,
+    EVT_CREATED,
+    EVT_LOST,
+    EVT_RECEIVED,
+    EVT_SENT,
+    NetworkEventScheduler,
+)
+from nw.packet import Packet, PacketTemplate
 
 if TYPE_CHECKING:
     from nw.link import Link
-    from nw.packet import Packet
-    from nw.network_event_scheduler import NetworkEventScheduler
+
+
+def _noop_log(packet, event_type, node_id=None) -> None:
+    """ログ無効時に使用する、何もしない置き換え関数"""
+    return None
 
 
 class Node:
@@ -12,7 +26,7 @@ class Node:
         self,
         node_id: int,
         address: str,
-        network_event_scheduler: "NetworkEventScheduler",
+        network_event_scheduler: NetworkEventScheduler,
     ) -> None:
         """ネットワーク内のノードを表すNodeクラス
 
@@ -25,6 +39,17 @@ class Node:
         self.address = address
         self.links: list[Link] = []  # ノードのリンク情報を格納するリスト
         self.network_event_scheduler = network_event_scheduler
+        # ホットパス用の短い別名（属性チェーンを1段減らす）
+        self._sched = network_event_scheduler
+        # ログが無効ならログ呼び出し自体を何もしない関数に差し替えて、
+        # パケットごとのメソッド呼び出しコストをゼロにする
+        if network_event_scheduler.log_enabled:
+            self._log_packet_info = network_event_scheduler.log_packet_info
+        else:
+            self._log_packet_info = _noop_log
+        # 配送イベント用にバインド済みメソッドを一度だけ作っておく
+        # （Linkがスケジュールするたびに生成されるのを防ぐ）
+        self._cb_receive = self.receive_packet
 
         label = f"Node {node_id}\n({address})"
         self.network_event_scheduler.add_node(node_id, label)
@@ -44,14 +69,12 @@ class Node:
         Args:
             packet (Packet): 送信するパケット
         """
-        self.network_event_scheduler.log_packet_info(packet, "sent", self.node_id)
-        if packet.header["destination"] == self.address:
+        self._log_packet_info(packet, EVT_SENT, self.node_id)
+        if packet.destination == self.address:
             self.receive_packet(packet)
-        else:
-            for link in self.links:
-                next_node = link.node_x if self != link.node_x else link.node_y
-                link.enque_packet(packet, self)
-                break
+        elif self.links:
+            # 現状は最初のリンクに送出する（ルーティングは未対応）
+            self.links[0].enque_packet(packet, self)
 
     def receive_packet(self, packet: "Packet") -> None:
         """ノードが受信したパケットを処理する
@@ -59,19 +82,20 @@ class Node:
         Args:
             packet (Packet): 受信したパケット
         """
+        sched = self._sched
         if packet.arrival_time == -1:
-            self.network_event_scheduler.log_packet_info(packet, "lost", self.node_id)
+            self._log_packet_info(packet, EVT_LOST, self.node_id)
+            # 役目を終えたパケットをプールに戻す
+            sched.release_packet(packet)
             return
-        if packet.header["destination"] == self.address:
-            self.network_event_scheduler.log_packet_info(
-                packet, "arrived", self.node_id
-            )
-            packet.set_arrived(self.network_event_scheduler.current_time)
+        if packet.destination == self.address:
+            self._log_packet_info(packet, EVT_ARRIVED, self.node_id)
+            # set_arrivedは単純な代入なのでインライン化する
+            packet.arrival_time = sched.current_time
+            # 役目を終えたパケットをプールに戻す
+            sched.release_packet(packet)
         else:
-            self.network_event_scheduler.log_packet_info(
-                packet, "received", self.node_id
-            )
-            pass
+            self._log_packet_info(packet, EVT_RECEIVED, self.node_id)
 
     def create_packet(
         self, destination: str, header_size: int, payload_size: int
@@ -84,14 +108,30 @@ class Node:
             payload_size (int): パケットのペイロードサイズ
 
         """
-        packet = Packet(
+        # プール経由で取得し、パケットごとの新規アロケーションを避ける
+        packet = self._sched.acquire_packet(
             source=self.address,
             destination=destination,
             header_size=header_size,
             payload_size=payload_size,
-            network_event_scheduler=self.network_event_scheduler,
         )
-        self.network_event_scheduler.log_packet_info(packet, "created", self.node_id)
+        self._log_packet_info(packet, EVT_CREATED, self.node_id)
+        self.send_packet(packet)
+
+    def create_packet_from_template(
+        self, template: PacketTemplate, destination: str
+    ) -> None:
+        """テンプレートからパケットを作成する
+
+        フロー内で共通の属性は事前計算済みのテンプレートから取るため、
+        パケットごとのサイズ計算と引数処理を省ける。
+
+        Args:
+            template (PacketTemplate): フローのパケットテンプレート
+            destination (str): パケットの宛先アドレス
+        """
+        packet = template.emit(self.address, destination, self._sched.current_time)
+        self._log_packet_info(packet, EVT_CREATED, self.node_id)
         self.send_packet(packet)
 
     def set_traffic(
@@ -104,19 +144,18 @@ class Node:
         payload_size: int,
         burstiness=1.0,
     ):
-        end_time = start_time + duration
-
-        def generate_packet():
-            if self.network_event_scheduler.current_time < end_time:
-                self.create_packet(destination, header_size, payload_size)
-                packet_size = header_size + payload_size
-                interval = (packet_size * 8) / bitrate * burstiness
-                self.network_event_scheduler.schedule_event(
-                    self.network_event_scheduler.current_time + interval,
-                    generate_packet,
-                )
-
-        self.network_event_scheduler.schedule_event(start_time, generate_packet)
+        # 送信間隔は期間中一定なので、全パケットの送信時刻を先に計算して
+        # 一括でスケジュールする（パケットごとの再スケジュールイベントを
+        # なくし、浮動小数点誤差の蓄積も防ぐ）
+        packet_size = header_size + payload_size
+        interval = (packet_size * 8) / bitrate * burstiness
+        num_packets = int(duration / interval)
+        times = (start_time + np.arange(num_packets) * interval).tolist()
+        # フロー内の全パケットで共通の属性は1つのテンプレートにまとめる
+        template = PacketTemplate(header_size, payload_size)
+        self.network_event_scheduler.schedule_batch(
+            times, self.create_packet_from_template, template, destination
+        )
 
     def __str__(self) -> str:
         """ノードの文字列表現を返す"""
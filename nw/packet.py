@@ -1,12 +1,46 @@
-import uuid
-from typing import Any, TYPE_CHECKING
+import itertools
+import math
+import sys
 
-if TYPE_CHECKING:
-    from nw.network_event_scheduler import NetworkEventScheduler
+
+# パケットIDの採番はuuid4ではなく単調増加のintカウンタで行う
+# （uuid4はos.urandom読み出しと36文字の16進文字列生成を伴い、
+# パケット生成のホットパスには重すぎる）
+_new_packet_id = itertools.count().__next__
 
 
 class Packet:
-    def __init__(self, source: str, destination: str, header_size: int, payload_size: int, network_event_scheduler: "NetworkEventScheduler") -> None:
+    # Packetは順序比較を定義しない
+    # 優先度付きキューに入れる場合は(時間, 連番, packet)の形で積み、
+    # 同時刻のタイブレークを必ずintの連番で決着させること
+    # （以前の「常にFalseを返す__lt__」は同時刻エントリの順序を不定にし、
+    # ヒープの比較回数を無駄に増やしていた）
+
+    # 属性を__slots__に固定してインスタンスごとの__dict__をなくす
+    # （headerのdictと合わせて1パケットあたり2つのdictを削減する）
+    __slots__ = (
+        "id",
+        "source",
+        "destination",
+        "_payload_size",
+        "size",
+        "creation_time",
+        "arrival_time",
+    )
+
+    # 各属性の型を明示しておく
+    # （mypycなどのAOTコンパイラがintやfloatをアンボックスした
+    # ネイティブ属性として扱えるようにするため。arrival_timeは
+    # Optional[float]ではなくfloat+NaN番兵なのでdoubleに落とせる）
+    id: int
+    source: str
+    destination: str
+    _payload_size: int
+    size: int
+    creation_time: float
+    arrival_time: float
+
+    def __init__(self, source: str, destination: str, header_size: int, payload_size: int, current_time: float) -> None:
         """ネットワーク内のパケットを表すPacketクラス
 
         Args:
@@ -14,37 +48,196 @@ class Packet:
             destination (str): パケットの宛先アドレス
             header_size (int): パケットのヘッダーサイズ
             payload_size (int): パケットのペイロードサイズ
-            network_event_scheduler (NetworkEventScheduler): ネットワークイベントスケジューラ
-        """
-        self.network_event_scheduler = network_event_scheduler
-        self.id = str(uuid.uuid4())
-        self.header = {
-            "source": source,
-            "destination": destination,
-        }
-        self.payload = "X" * payload_size
+            current_time (float): パケットの作成時刻（スケジューラの現在時刻）
+        """
+        self.id = _new_packet_id()
+        # 送信元・宛先はdictに包まず属性として直接持つ
+        # internすることで同じアドレス文字列は全パケットで1オブジェクトに
+        # 集約され、宛先判定などの等価比較がポインタ比較で決着する
+        self.source = sys.intern(source)
+        self.destination = sys.intern(destination)
+        # ペイロードは実体の文字列を確保せず、サイズだけを記録する
+        # （シミュレーションが参照するのはself.sizeのみ）
+        self._payload_size = payload_size
         self.size = header_size + payload_size
-        self.creation_time = self.network_event_scheduler.current_time
-        self.arrival_time = None
-    
+        # スケジューラへの参照は持たず、作成時刻だけを受け取る
+        # （パケットごとの属性チェーン参照と強参照の保持をなくす）
+        self.creation_time = current_time
+        # 到着時刻はNoneではなくNaNを番兵値とする
+        # （属性をfloatに固定でき、未到着判定はmath.isnanで行う）
+        self.arrival_time = math.nan
+
+    @classmethod
+    def create_batch(
+        cls,
+        n: int,
+        source: str,
+        destination: str,
+        header_size: int,
+        payload_size: int,
+        current_time: float,
+    ) -> list["Packet"]:
+        """同じ属性を持つパケットをまとめてn個作成する
+
+        __init__の呼び出しとキーワード引数処理をバイパスして属性を直接
+        設定するため、1個ずつ構築するよりインタプリタのオーバーヘッドが
+        小さい。バースト送信のように同時刻・同サイズのパケットを大量に
+        用意する呼び出し側向け。
+
+        Args:
+            n (int): 作成するパケット数
+            source (str): パケットの送信元アドレス
+            destination (str): パケットの宛先アドレス
+            header_size (int): パケットのヘッダーサイズ
+            payload_size (int): パケットのペイロードサイズ
+            current_time (float): パケットの作成時刻
+        """
+        size = header_size + payload_size
+        # internはループの外で1回だけ行う
+        source = sys.intern(source)
+        destination = sys.intern(destination)
+        new = cls.__new__
+        packets = [new(cls) for _ in range(n)]
+        next_id = _new_packet_id
+        for packet in packets:
+            packet.id = next_id()
+            packet.source = source
+            packet.destination = destination
+            packet._payload_size = payload_size
+            packet.size = size
+            packet.creation_time = current_time
+            packet.arrival_time = math.nan
+        return packets
+
+    # 再利用待ちインスタンスのフリーリストとその上限
+    # （割り当てとGCの負荷を抑えるため、使い終わったパケットを再利用する）
+    _pool: list["Packet"] = []
+    _POOL_MAX = 4096
+
+    @classmethod
+    def acquire(
+        cls,
+        source: str,
+        destination: str,
+        header_size: int,
+        payload_size: int,
+        current_time: float,
+    ) -> "Packet":
+        """フリーリストからパケットを取得する（空なら新規作成する）
+
+        再利用するインスタンスは属性をその場で設定し直し、
+        IDは一意性を保つため取得のたびに新しく採番する。
+
+        Args:
+            source (str): パケットの送信元アドレス
+            destination (str): パケットの宛先アドレス
+            header_size (int): パケットのヘッダーサイズ
+            payload_size (int): パケットのペイロードサイズ
+            current_time (float): パケットの作成時刻
+        """
+        pool = cls._pool
+        if pool:
+            packet = pool.pop()
+            packet.id = _new_packet_id()
+            packet.source = sys.intern(source)
+            packet.destination = sys.intern(destination)
+            packet._payload_size = payload_size
+            packet.size = header_size + payload_size
+            packet.creation_time = current_time
+            packet.arrival_time = math.nan
+            return packet
+        return cls(source, destination, header_size, payload_size, current_time)
+
+    @classmethod
+    def release(cls, packet: "Packet") -> None:
+        """使い終わったパケットをフリーリストに戻す
+
+        Args:
+            packet (Packet): 返却するパケット
+        """
+        pool = cls._pool
+        # 上限を超えない範囲で戻し、次のacquireで再利用する
+        if len(pool) < cls._POOL_MAX:
+            pool.append(packet)
+
+    # ペイロード文字列のキャッシュ（サイズごとに1つだけ生成して共有する）
+    _PAYLOAD_CACHE: dict[int, str] = {}
+
+    # __str__用のフォーマットをクラスで1回だけ束縛しておく
+    # （呼び出しごとのフォーマット文字列の解析を避ける）
+    _FMT = "Packet(source={}, destination={}, payload=<{} bytes>)".format
+
+    @property
+    def header(self) -> dict:
+        """ヘッダーをdict形式で参照したい場合のための互換プロパティ"""
+        return {"source": self.source, "destination": self.destination}
+
+    @property
+    def payload(self) -> str:
+        """ペイロード相当の文字列が必要な場合のための互換プロパティ
+
+        同じサイズのペイロードはキャッシュした1つの文字列を共有する
+        """
+        payload = Packet._PAYLOAD_CACHE.get(self._payload_size)
+        if payload is None:
+            payload = Packet._PAYLOAD_CACHE[self._payload_size] = (
+                "X" * self._payload_size
+            )
+        return payload
+
     def set_arrived(self, arrival_time: float) -> None:
-        """パケットの到着時間を設定する
+        """パケットの到着時間を設定する（未到着の間はNaNが入っている）
 
         Args:
             arrival_time (float): パケットの到着時間
         """
         self.arrival_time = arrival_time
 
-    def __lt__(self, other: Any) -> bool:
-        """パケットの比較を定義する
+    def __str__(self) -> str:
+        """パケットの文字列表現を返す"""
+        return Packet._FMT(self.source, self.destination, self._payload_size)
+
+
+class PacketTemplate:
+    """同一フローのパケットが共有する属性を事前計算しておくテンプレート
+
+    多くのトラフィック生成はフローごとに(header_size, payload_size)が
+    固定なのに、パケット構築のたびに加算をやり直している。合計サイズを
+    ここで1回だけ計算して保持し、emitで属性を直接設定することで、
+    パケットごとの再計算と__init__の引数処理を省く。
+    """
+
+    __slots__ = ("_payload_size", "size")
+
+    def __init__(self, header_size: int, payload_size: int) -> None:
+        """パケットテンプレートの初期化
 
         Args:
-            other (Any): 比較対象のオブジェクト
+            header_size (int): パケットのヘッダーサイズ
+            payload_size (int): パケットのペイロードサイズ
         """
-        return False
+        self._payload_size = payload_size
+        # 合計サイズはフロー内の全パケットで共通なので事前計算する
+        self.size = header_size + payload_size
 
-    def __str__(self) -> str:
-        """パケットの文字列表現を返す"""
-        return f"Packet(source={self.header['source']}, destination={self.header['destination']}, payload={self.payload})"
+    def emit(self, source: str, destination: str, current_time: float) -> Packet:
+        """テンプレートからパケットを1つ生成する
+
+        Packetのフリーリストから再利用できる場合はそれを使い、
+        なければ__init__をバイパスして直接構築する。
 
-    
\ No newline at end of file
+        Args:
+            source (str): パケットの送信元アドレス
+            destination (str): パケットの宛先アドレス
+            current_time (float): パケットの作成時刻
+        """
+        pool = Packet._pool
+        packet = pool.pop() if pool else Packet.__new__(Packet)
+        packet.id = _new_packet_id()
+        packet.source = sys.intern(source)
+        packet.destination = sys.intern(destination)
+        packet._payload_size = self._payload_size
+        packet.size = self.size
+        packet.creation_time = current_time
+        packet.arrival_time = math.nan
+        return packet
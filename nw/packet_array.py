@@ -0,0 +1,161 @@
+import math
+
+import numpy as np
+
+from nw.packet import _new_packet_id
+
+# Numbaが利用できる場合は走査カーネルをJITコンパイルする（任意依存）
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+# 各列の初期容量
+INITIAL_CAPACITY = 1024
+
+
+if njit is not None:
+
+    @njit(cache=True, parallel=True)
+    def _arrived_by_mask(arrival_time, t):
+        """時刻tまでに到着したパケットのブールマスクを並列ループで作る
+
+        cache=Trueでコンパイル結果をディスクに保存し、シミュレーション
+        起動のたびにJITウォームアップを払い直さないようにする。
+
+        Args:
+            arrival_time (np.ndarray): 到着時刻の列（未到着はNaN）
+            t (float): 判定の基準時刻
+        """
+        out = np.empty(arrival_time.size, np.bool_)
+        for i in prange(arrival_time.size):
+            v = arrival_time[i]
+            out[i] = (not math.isnan(v)) and v <= t
+        return out
+
+else:
+
+    def _arrived_by_mask(arrival_time, t):
+        """時刻tまでに到着したパケットのブールマスクを返す（NumPy版）
+
+        NaN（未到着）との比較はFalseになるため、isnanの判定は不要。
+
+        Args:
+            arrival_time (np.ndarray): 到着時刻の列（未到着はNaN）
+            t (float): 判定の基準時刻
+        """
+        return arrival_time <= t
+
+
+class PacketArray:
+    """パケット群を列指向（SoA）で保持するコンテナクラス
+
+    Packetインスタンスを1つずつ作る代わりに、ID・アドレス・サイズ・
+    時刻を並行するNumPy配列の列として保持する。パケット1件あたりの
+    メモリがPyObject+スロットの数百バイトから数十バイトまで減り、
+    「時刻tまでに到着したパケットはどれか」といった走査を
+    Pythonループではなくベクトル演算で処理できる。
+
+    アドレス文字列は共有テーブルに1回だけ格納し、列には
+    そのテーブルのインデックス（uint32）を入れる。
+    appendが返す行番号がパケットのハンドルとなる。
+    """
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        """パケット配列の初期化
+
+        Args:
+            capacity (int): 各列の初期容量
+        """
+        # 格納済みのパケット数
+        self.size = 0
+        # パケットごとの属性を保持する並行配列（列）
+        self.ids = np.empty(capacity, dtype=np.uint64)
+        self.source_index = np.empty(capacity, dtype=np.uint32)
+        self.destination_index = np.empty(capacity, dtype=np.uint32)
+        self.sizes = np.empty(capacity, dtype=np.uint32)
+        self.creation_time = np.empty(capacity, dtype=np.float64)
+        self.arrival_time = np.empty(capacity, dtype=np.float64)
+        # アドレス文字列の共有テーブルと逆引き辞書
+        self.address_table: list[str] = []
+        self._address_indices: dict[str, int] = {}
+
+    def _address_index(self, address: str) -> int:
+        """アドレス文字列を共有テーブルのインデックスに変換する
+
+        Args:
+            address (str): アドレス文字列
+        """
+        index = self._address_indices.get(address)
+        if index is None:
+            # 初出のアドレスはテーブルの末尾に登録する
+            index = len(self.address_table)
+            self._address_indices[address] = index
+            self.address_table.append(address)
+        return index
+
+    def _grow(self) -> None:
+        """各列の容量を2倍に拡張する"""
+        new_capacity = self.ids.size * 2
+        for name in (
+            "ids",
+            "source_index",
+            "destination_index",
+            "sizes",
+            "creation_time",
+            "arrival_time",
+        ):
+            setattr(self, name, np.resize(getattr(self, name), new_capacity))
+
+    def append(
+        self, source: str, destination: str, size: int, creation_time: float
+    ) -> int:
+        """パケットを1件追加し、ハンドルとなる行番号を返す
+
+        Args:
+            source (str): パケットの送信元アドレス
+            destination (str): パケットの宛先アドレス
+            size (int): パケットのサイズ（バイト）
+            creation_time (float): パケットの作成時刻
+        """
+        i = self.size
+        if i == self.ids.size:
+            self._grow()
+        self.ids[i] = _new_packet_id()
+        self.source_index[i] = self._address_index(source)
+        self.destination_index[i] = self._address_index(destination)
+        self.sizes[i] = size
+        self.creation_time[i] = creation_time
+        # 未到着はNaNで表す（Packet.arrival_timeと同じ規約）
+        self.arrival_time[i] = math.nan
+        self.size = i + 1
+        return i
+
+    def set_arrived(self, index: int, arrival_time: float) -> None:
+        """指定した行のパケットの到着時刻を設定する
+
+        Args:
+            index (int): appendが返した行番号
+            arrival_time (float): パケットの到着時間
+        """
+        self.arrival_time[index] = arrival_time
+
+    def arrived_by(self, t: float) -> np.ndarray:
+        """時刻tまでに到着したパケットを示すブールマスクを返す
+
+        格納済みの範囲をPythonループではなく1回のカーネル呼び出しで
+        走査する（Numbaがあれば並列Cループ、なければNumPyのベクトル比較）。
+
+        Args:
+            t (float): 判定の基準時刻
+        """
+        return _arrived_by_mask(self.arrival_time[: self.size], t)
+
+    def arrived_mask(self) -> np.ndarray:
+        """到着済みのパケットを示すブールマスクを返す"""
+        # 格納済みの範囲だけを1回のベクトル演算で判定する
+        return ~np.isnan(self.arrival_time[: self.size])
+
+    def __len__(self) -> int:
+        """格納済みのパケット数を返す"""
+        return self.size